@@ -1,14 +1,17 @@
 # BackPork Integration Routes for Y2JB-WebUI
 # Add these routes to your server.py file.
-# Requires: app, request, jsonify, render_template, get_config, logger (logging.getLogger(__name__)), sys.
+# Requires: app, request, jsonify, render_template, Response, stream_with_context, get_config,
+# logger (logging.getLogger(__name__)), sys.
 
 from src.backpork_manager import (
     list_installed_games, create_fakelib_folder, fetch_system_library,
-    process_library_for_game, REQUIRED_LIBS
+    process_library_for_game, process_libraries_for_game, process_batch_for_games, precheck_libraries,
+    summarize_library_results, check_precheck_request, games_catalog, library_jobs, REQUIRED_LIBS
 )
 import subprocess
 import sys
 import inspect
+import json
 
 # BackPork endpoints
 @app.route('/backpork')
@@ -63,11 +66,35 @@ def api_backpork_list_games():
         if not ip:
             return jsonify({"success": False, "error": "IP Address not set"}), 400
         
-        result = list_installed_games(ip, port)
+        # Answered from the background catalog; ?refresh=1 re-lists /user/app first
+        result = games_catalog.get(ip, port, refresh=request.args.get('refresh') == '1')
         return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/backpork/cover/<title_id>', methods=['GET'])
+def api_backpork_cover(title_id):
+    """Serve a cached game cover (?size=thumb for the thumbnail) with ETag/Cache-Control"""
+    try:
+        from flask import send_file
+        from src.backpork_manager import get_game_cover
+        if not title_id.replace('-', '').replace('_', '').isalnum():
+            return jsonify({"success": False, "error": "Invalid title_id"}), 400
+        config = get_config()
+        cover = get_game_cover(
+            title_id, thumbnail=request.args.get('size') == 'thumb',
+            ip=config.get("ip"), port=config.get("ftp_port", "1337")
+        )
+        if not cover['success']:
+            return jsonify(cover), 404
+        # Versioned URLs (?v=<sha>) never change content, so they can be cached for good
+        cache_control = "public, max-age=31536000, immutable" if request.args.get('v') else "public, max-age=3600"
+        response = send_file(cover['path'], mimetype='image/png', etag=cover['etag'], conditional=True)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/backpork/create_fakelib', methods=['POST'])
 def api_backpork_create_fakelib():
     try:
@@ -133,53 +160,62 @@ def api_backpork_discover_paths():
         port = config.get("ftp_port", "1337")
         if not ip:
             return jsonify({"success": False, "error": "IP Address not set"}), 400
-        from src.backpork_manager import get_ftp_connection
-        import ftplib
-        ftp = None
+        from src.backpork_manager import refresh_game_index, probe_ftp_paths, list_ftp_directory
+        data = request.get_json(silent=True) or {}
+        # Incremental by default: only folders whose listing changed are re-listed
+        index = refresh_game_index(ip, port, full=bool(data.get('full')))
+        listings = dict(index["paths"])
+        # Not game search paths, so the index never lists them; still worth reporting
+        extra_paths = ["/mnt", "/user", "/user/app"]
+        for path, entries in zip(extra_paths, probe_ftp_paths(ip, port, extra_paths, list_ftp_directory)):
+            if entries is not None:
+                listings[path] = entries
+        roots = ["/data", "/mnt", "/mnt/ext0", "/user"] + [f"/mnt/usb{usb_num}" for usb_num in range(8)]
+
+        def root_order(path):
+            return max(n for n, root in enumerate(roots) if path == root or path.startswith(root + '/'))
+
         accessible_paths = []
         game_directories = []
-        try:
-            ftp = get_ftp_connection(ip, port)
-            potential_paths = [
-                "/data", "/data/games", "/data/homebrew", "/data/etaHEN", "/data/etaHEN/games",
-                "/mnt", "/mnt/ext0", "/mnt/ext0/games", "/mnt/ext0/homebrew", "/mnt/ext0/etaHEN",
-                "/user", "/user/app",
-            ]
-            for usb_num in range(8):
-                potential_paths.extend([
-                    f"/mnt/usb{usb_num}", f"/mnt/usb{usb_num}/games",
-                    f"/mnt/usb{usb_num}/homebrew", f"/mnt/usb{usb_num}/etaHEN", f"/mnt/usb{usb_num}/etaHEN/games",
-                ])
-            for path in potential_paths:
-                try:
-                    ftp.cwd(path)
-                    lines = []
-                    ftp.retrlines('LIST', lines.append)
-                    accessible_paths.append({
-                        "path": path, "item_count": len(lines),
-                        "items": [line.split()[-1] for line in lines[:10]]
-                    })
-                    for line in lines:
-                        parts = line.split()
-                        if len(parts) >= 9:
-                            name = parts[-1]
-                            if (name.startswith('PPSA') or name.startswith('CUSA')) and parts[0].startswith('d'):
-                                game_directories.append({"path": f"{path}/{name}", "title_id": name})
-                except Exception:
-                    pass
-            return jsonify({
-                "success": True,
-                "accessible_paths": accessible_paths,
-                "game_directories": game_directories
+        for path in sorted(listings, key=root_order):
+            entries = listings[path]
+            accessible_paths.append({
+                "path": path, "item_count": len(entries),
+                "items": [entry["name"] for entry in entries[:10]]
             })
-        except Exception as e:
-            return jsonify({"success": False, "error": str(e)}), 500
-        finally:
-            if ftp:
-                try:
-                    ftp.quit()
-                except Exception:
-                    pass
+            for entry in entries:
+                name = entry["name"]
+                if entry["type"] == 'dir' and (name.startswith('PPSA') or name.startswith('CUSA')):
+                    game_directories.append({"path": f"{path}/{name}", "title_id": name})
+        return jsonify({
+            "success": True,
+            "accessible_paths": accessible_paths,
+            "game_directories": game_directories,
+            "titles": index["titles"],
+            "updated": index["updated"]
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/backpork/precheck', methods=['POST'])
+def api_backpork_precheck():
+    """Check which firmware patches match the console's system libraries (no patching)"""
+    try:
+        config = get_config()
+        ip = config.get("ip")
+        port = config.get("ftp_port", "1337")
+        data = request.json or {}
+        firmware = data.get('firmware') or None  # optional: '6xx' or '7xx', default all
+        selected_libs = data.get('libraries', list(REQUIRED_LIBS.keys()))
+        
+        if not ip:
+            return jsonify({"success": False, "error": "IP Address not set"}), 400
+        error = check_precheck_request(firmware, selected_libs)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        result = precheck_libraries(ip, port, firmware, selected_libs)
+        return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -193,6 +229,7 @@ def api_backpork_process_libraries():
         firmware = data.get('firmware')  # '6xx' or '7xx'
         game_path = data.get('game_path')
         selected_libs = data.get('libraries', list(REQUIRED_LIBS.keys()))
+        prune = bool(data.get('prune'))  # delete previously uploaded libraries that are no longer selected
         
         if not ip:
             return jsonify({"success": False, "error": "IP Address not set"}), 400
@@ -201,51 +238,27 @@ def api_backpork_process_libraries():
         if not game_path:
             return jsonify({"success": False, "error": "Game path not provided"}), 400
         
-        results = []
         print(f"\n[BACKPORK] ========== Starting library processing ==========")
         print(f"[BACKPORK] IP: {ip}, Port: {port}")
         print(f"[BACKPORK] Firmware: {firmware}, Game path: {game_path}")
         print(f"[BACKPORK] Libraries to process: {selected_libs}")
         print(f"[BACKPORK] ===================================================\n")
         
-        for lib_name in selected_libs:
-            print(f"\n[BACKPORK] Processing library: {lib_name}")
-            print(f"[BACKPORK] ===================================================")
-            try:
-                result = process_library_for_game(ip, port, lib_name, firmware, game_path)
-                print(f"[BACKPORK] Result for {lib_name}: success={result.get('success')}, error={result.get('error')}")
-                results.append({
-                    "library": lib_name,
-                    "success": result.get("success", False),
-                    "message": result.get("message") or result.get("error", "Unknown error"),
-                    "steps": result.get("steps", [])
-                })
-                if result.get("success"):
-                    print(f"[BACKPORK] ✓ {lib_name} processed successfully")
-                else:
-                    error_msg = result.get('error', 'Unknown error')
-                    print(f"[BACKPORK] ✗ {lib_name} failed: {error_msg}")
-                    sys.stdout.flush()
-            except Exception as e:
-                import traceback
-                error_trace = traceback.format_exc()
-                print(f"[BACKPORK] ✗✗✗ EXCEPTION processing {lib_name}: {e}")
-                print(f"[BACKPORK] Full traceback:")
-                print(error_trace)
-                sys.stdout.flush()
-                sys.stderr.flush()
-                results.append({
-                    "library": lib_name,
-                    "success": False,
-                    "message": f"Exception: {str(e)}",
-                    "steps": []
-                })
+        # Libraries run concurrently; results come back in the requested order
+        lib_results = process_libraries_for_game(ip, port, selected_libs, firmware, game_path)
+        for lib_name, result in zip(selected_libs, lib_results):
+            print(f"[BACKPORK] Result for {lib_name}: success={result.get('success')}, error={result.get('error')}")
+            if result.get("success"):
+                print(f"[BACKPORK] ✓ {lib_name} processed successfully")
+            else:
+                print(f"[BACKPORK] ✗ {lib_name} failed: {result.get('error', 'Unknown error')}")
+        sys.stdout.flush()
         
-        all_success = all(r["success"] for r in results)
-        return jsonify({
-            "success": all_success,
-            "results": results
-        })
+        summary = summarize_library_results(ip, port, selected_libs, lib_results, prune=prune)
+        sync = summary["sync"]
+        print(f"[BACKPORK] Sync: {sync['uploaded']} uploaded, {sync['skipped']} skipped (unchanged), {len(sync['pruned'])} pruned")
+        
+        return jsonify(summary)
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -255,3 +268,125 @@ def api_backpork_process_libraries():
         sys.stdout.flush()
         sys.stderr.flush()
         return jsonify({"success": False, "error": str(e), "traceback": error_trace}), 500
+
+@app.route('/api/backpork/process_batch', methods=['POST'])
+def api_backpork_process_batch():
+    """Backport several games at once: each library is fetched, patched and signed once, then synced to every game"""
+    try:
+        config = get_config()
+        ip = config.get("ip")
+        port = config.get("ftp_port", "1337")
+        data = request.json or {}
+        firmware = data.get('firmware')  # '6xx' or '7xx'
+        game_paths = data.get('game_paths') or []
+        selected_libs = data.get('libraries', list(REQUIRED_LIBS.keys()))
+        prune = bool(data.get('prune'))  # delete previously uploaded libraries that are no longer selected
+        
+        if not ip:
+            return jsonify({"success": False, "error": "IP Address not set"}), 400
+        if not firmware:
+            return jsonify({"success": False, "error": "Firmware version not selected"}), 400
+        if not game_paths:
+            return jsonify({"success": False, "error": "No game paths provided"}), 400
+        
+        print(f"\n[BACKPORK] ========== Starting batch processing ==========")
+        print(f"[BACKPORK] IP: {ip}, Port: {port}, Firmware: {firmware}")
+        print(f"[BACKPORK] Games: {len(game_paths)}, Libraries: {selected_libs}")
+        print(f"[BACKPORK] ================================================\n")
+        
+        batch = process_batch_for_games(ip, port, game_paths, selected_libs, firmware)
+        games = []
+        for game in batch["games"]:
+            summary = summarize_library_results(ip, port, selected_libs, game["results"], prune=prune)
+            sync = summary["sync"]
+            print(f"[BACKPORK] {'✓' if game['success'] else '✗'} {game['game_path']}: "
+                  f"{sync['uploaded']} uploaded, {sync['skipped']} skipped, {len(sync['pruned'])} pruned")
+            games.append({
+                "game_path": game["game_path"],
+                "success": game["success"],
+                "results": summary["results"],
+                "sync": sync
+            })
+        sys.stdout.flush()
+        
+        return jsonify({
+            "success": batch["success"],
+            "libraries": batch["libraries"],
+            "games": games
+        })
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"[BACKPORK] ✗✗✗ TOP-LEVEL EXCEPTION in process_batch: {e}")
+        print(error_trace)
+        sys.stdout.flush()
+        return jsonify({"success": False, "error": str(e), "traceback": error_trace}), 500
+
+@app.route('/api/backpork/jobs', methods=['POST'])
+def api_backpork_submit_job():
+    """Queue process_libraries as a background job; returns the job id straight away"""
+    try:
+        config = get_config()
+        ip = config.get("ip")
+        port = config.get("ftp_port", "1337")
+        data = request.json or {}
+        firmware = data.get('firmware')  # '6xx' or '7xx'
+        game_path = data.get('game_path')
+        selected_libs = data.get('libraries', list(REQUIRED_LIBS.keys()))
+        prune = bool(data.get('prune'))
+        
+        if not ip:
+            return jsonify({"success": False, "error": "IP Address not set"}), 400
+        if not firmware:
+            return jsonify({"success": False, "error": "Firmware version not selected"}), 400
+        if not game_path:
+            return jsonify({"success": False, "error": "Game path not provided"}), 400
+        
+        job = library_jobs.submit(ip, port, game_path, selected_libs, firmware, prune=prune)
+        return jsonify({"success": True, "job": job}), 202
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/backpork/jobs', methods=['GET'])
+def api_backpork_list_jobs():
+    """Recent jobs, newest first"""
+    return jsonify({"success": True, "jobs": library_jobs.recent()})
+
+@app.route('/api/backpork/jobs/<job_id>', methods=['GET'])
+def api_backpork_job_status(job_id):
+    """Current state of a job, with per-library results once it has finished"""
+    job = library_jobs.status(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Unknown job {job_id}"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/backpork/jobs/<job_id>/cancel', methods=['POST'])
+def api_backpork_cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next step"""
+    job = library_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Unknown job {job_id}"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/backpork/jobs/<job_id>/events', methods=['GET'])
+def api_backpork_job_events(job_id):
+    """
+    Server-Sent Events for a job: a 'snapshot' event with the current state,
+    then 'status', 'stage', 'transfer' and 'library' events until it finishes.
+    Reconnects (Last-Event-ID) get a fresh snapshot and only newer events.
+    """
+    job = library_jobs.status(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Unknown job {job_id}"}), 404
+    
+    def stream():
+        yield f"id: {job['last_event']}\nevent: snapshot\ndata: {json.dumps(job)}\n\n"
+        for event in library_jobs.events(job_id, after=job['last_event']):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
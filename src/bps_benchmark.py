@@ -0,0 +1,269 @@
+"""
+BPS patch engine benchmark for backpork_manager.
+
+Generates synthetic source libraries and patches weighted toward each BPS
+action type, applies them in memory (CompiledBpsPatch.apply) and
+file-to-file (CompiledBpsPatch.apply_to_file), and reports throughput,
+peak traced memory and allocated blocks per patch.
+
+Run from the Y2JB-WebUI directory:
+    python -m src.bps_benchmark                      # full run, writes JSON results
+    python -m src.bps_benchmark --save-baseline      # store results as the new baseline
+    python -m src.bps_benchmark --threshold 15       # fail if >15% slower than baseline
+
+Exits with status 1 when any case's throughput drops more than
+--threshold percent below the stored baseline.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import struct
+import zlib
+import argparse
+import tempfile
+import platform
+import contextlib
+import tracemalloc
+
+from src.backpork_manager import CACHE_DIR, CompiledBpsPatch, ensure_dir, encode_bps_vli
+
+BENCHMARK_DIR = os.path.join(CACHE_DIR, "benchmarks")
+DEFAULT_RESULTS_PATH = os.path.join(BENCHMARK_DIR, "bps_results.json")
+DEFAULT_BASELINE_PATH = os.path.join(BENCHMARK_DIR, "bps_baseline.json")
+
+KiB = 1 << 10
+MiB = 1 << 20
+DEFAULT_SIZES = [256 * KiB, 1 * MiB, 4 * MiB, 16 * MiB, 64 * MiB]
+
+# Action mix per patch profile: (SourceRead, TargetRead, SourceCopy, TargetCopy) weights
+PATCH_PROFILES = {
+    "source_read": (90, 4, 4, 2),
+    "target_read": (10, 80, 5, 5),
+    "target_copy": (10, 5, 5, 80),
+}
+MODES = ["memory", "file"]
+
+def generate_source(size, seed):
+    """Synthetic library: random code-like runs, zero padding and repeated tables"""
+    rng = random.Random(seed)
+    out = bytearray()
+    while len(out) < size:
+        kind = rng.random()
+        if kind < 0.6:
+            out += rng.randbytes(rng.randrange(512, 32 * KiB))
+        elif kind < 0.85:
+            out += bytes(rng.randrange(16, 4 * KiB))
+        else:
+            out += rng.randbytes(rng.choice([4, 8, 16, 24])) * rng.randrange(8, 256)
+    return bytes(out[:size])
+
+def generate_patch(source, profile, seed):
+    """
+    Build a valid BPS patch (with CRC32 footer) that turns `source` into a
+    target of the same size using the action mix of `profile`.
+    """
+    rng = random.Random(seed)
+    weights = PATCH_PROFILES[profile]
+    size = len(source)
+    target = bytearray()
+    patch = bytearray(b'BPS1')
+    patch += encode_bps_vli(size) + encode_bps_vli(size) + encode_bps_vli(0)
+    source_relative = 0
+    target_relative = 0
+
+    def emit_offset(delta):
+        patch.extend(encode_bps_vli((abs(delta) << 1) | (1 if delta < 0 else 0)))
+
+    while len(target) < size:
+        pos = len(target)
+        action = rng.choices(range(4), weights)[0]
+        if action == 3 and pos == 0:
+            action = 1
+        if action == 1:
+            length = min(rng.randrange(1, 4 * KiB), size - pos)
+        else:
+            length = min(rng.randrange(1, 64 * KiB), size - pos)
+        patch += encode_bps_vli(((length - 1) << 2) | action)
+
+        if action == 0:  # SourceRead
+            target += source[pos:pos + length]
+        elif action == 1:  # TargetRead
+            data = rng.randbytes(length)
+            patch += data
+            target += data
+        elif action == 2:  # SourceCopy
+            offset = rng.randrange(0, size - length + 1)
+            emit_offset(offset - source_relative)
+            target += source[offset:offset + length]
+            source_relative = offset + length
+        else:  # TargetCopy, mostly short overlapping back-references
+            distance = rng.choice([1, 2, 4, 8, 16, 64, rng.randrange(1, pos + 1)])
+            distance = min(distance, pos)
+            offset = pos - distance
+            emit_offset(offset - target_relative)
+            period = bytes(target[offset:pos])
+            target += (period * (length // distance + 1))[:length]
+            target_relative = offset + length
+
+    patch += struct.pack('<II', zlib.crc32(source), zlib.crc32(target))
+    patch += struct.pack('<I', zlib.crc32(patch))
+    return bytes(patch)
+
+def _run_once(compiled, source, source_path, target_path, mode):
+    if mode == "memory":
+        return compiled.apply(source)
+    return compiled.apply_to_file(source_path, target_path)
+
+def measure_case(compiled, source, source_path, target_path, mode, repeat):
+    """Best-of-`repeat` wall time, then one traced run for memory and allocations"""
+    best = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = _run_once(compiled, source, source_path, target_path, mode)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            del result
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = _run_once(compiled, source, source_path, target_path, mode)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        # Blocks allocated by the run and still alive when it returns (the result included)
+        allocated_blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(before, 'filename'))
+        del result
+
+    return {
+        "seconds": best,
+        "throughput_mb_s": len(source) / best / 1e6 if best else 0.0,
+        "peak_memory_bytes": peak,
+        "allocated_blocks": allocated_blocks,
+    }
+
+def run_benchmark(sizes=None, profiles=None, modes=None, repeat=3, seed=1337):
+    """
+    Run every (size, profile, mode) case and return the results dict.
+    Each patch is verified against its target CRC32 by the engine itself.
+    """
+    sizes = sizes or DEFAULT_SIZES
+    profiles = profiles or list(PATCH_PROFILES.keys())
+    modes = modes or MODES
+    cases = []
+    work_dir = tempfile.mkdtemp(prefix="bps-bench-")
+    try:
+        for size in sizes:
+            source = generate_source(size, seed + size)
+            source_path = os.path.join(work_dir, "source.elf")
+            target_path = os.path.join(work_dir, "target.elf")
+            with open(source_path, 'wb') as f:
+                f.write(source)
+            for profile in profiles:
+                patch_data = generate_patch(source, profile, seed + size + len(profile))
+                compiled = CompiledBpsPatch(patch_data)
+                for mode in modes:
+                    stats = measure_case(compiled, source, source_path, target_path, mode, repeat)
+                    case = {
+                        "name": f"{profile}/{mode}/{size // KiB}KiB",
+                        "profile": profile,
+                        "mode": mode,
+                        "size": size,
+                        "actions": len(compiled),
+                        "patch_size": len(patch_data),
+                        **stats,
+                    }
+                    cases.append(case)
+                    print(f"[BENCH] {case['name']:<28} {case['throughput_mb_s']:9.1f} MB/s  "
+                          f"peak {case['peak_memory_bytes'] / MiB:8.2f} MiB  "
+                          f"blocks {case['allocated_blocks']:6d}  actions {case['actions']}")
+                    sys.stdout.flush()
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "cases": cases,
+    }
+
+def compare_to_baseline(results, baseline, threshold_percent):
+    """Return a list of regression messages (empty if within threshold)"""
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        reference = baseline_cases.get(case["name"])
+        if not reference or not reference.get("throughput_mb_s"):
+            continue
+        change = (case["throughput_mb_s"] - reference["throughput_mb_s"]) / reference["throughput_mb_s"] * 100
+        case["baseline_throughput_mb_s"] = reference["throughput_mb_s"]
+        case["change_percent"] = change
+        if change < -threshold_percent:
+            regressions.append(
+                f"{case['name']}: {case['throughput_mb_s']:.1f} MB/s vs baseline "
+                f"{reference['throughput_mb_s']:.1f} MB/s ({change:.1f}%)"
+            )
+    return regressions
+
+def write_json(path, data):
+    ensure_dir(os.path.dirname(os.path.abspath(path)))
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the BackPork BPS patch engine")
+    parser.add_argument('--sizes', type=lambda v: [int(x) * KiB for x in v.split(',')],
+                        help="comma-separated source sizes in KiB (default: 256,1024,4096,16384,65536)")
+    parser.add_argument('--profiles', type=lambda v: v.split(','),
+                        help=f"comma-separated patch profiles (default: {','.join(PATCH_PROFILES)})")
+    parser.add_argument('--modes', type=lambda v: v.split(','), help="memory,file (default: both)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, best is kept")
+    parser.add_argument('--output', default=DEFAULT_RESULTS_PATH, help="where to write the JSON results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help="stored baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="fail if throughput drops more than this percentage below the baseline")
+    args = parser.parse_args(argv)
+
+    for profile in args.profiles or []:
+        if profile not in PATCH_PROFILES:
+            parser.error(f"unknown profile {profile!r}")
+    for mode in args.modes or []:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode!r}")
+
+    results = run_benchmark(args.sizes, args.profiles, args.modes, args.repeat)
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        results["baseline"] = args.baseline
+        results["threshold_percent"] = args.threshold
+        results["regressions"] = regressions
+
+    write_json(args.output, results)
+    print(f"[BENCH] Results written to {args.output}")
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"[BENCH] Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"[BENCH] FAIL: {len(regressions)} case(s) regressed more than {args.threshold}%:")
+        for message in regressions:
+            print(f"[BENCH]   {message}")
+        return 1
+    print("[BENCH] OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
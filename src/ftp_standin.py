@@ -0,0 +1,599 @@
+"""
+Local stand-in for the ftpsrv-ps5 payload, for offline benchmarks and
+regression runs of the FTP code in backpork_manager.
+
+Serves a folder laid out like the console (/user/app, /data/etaHEN/games,
+/mnt/usbN, /system/common/lib) over plain FTP from an in-process, threaded
+stdlib server. Per-command latency, a per-connection bandwidth cap, a
+connection limit and injected faults can be set to mimic a console on a
+weak link.
+
+Run from the Y2JB-WebUI directory:
+    python -m src.ftp_standin --port 2121 --latency 20 --bandwidth 4096   # serve until Ctrl+C
+    python -m src.ftp_standin --benchmark --latency 20 --games 40        # time the manager's FTP paths
+
+In code:
+    with FtpStandIn(latency=0.02, bandwidth=4 * MiB) as server:
+        server.inject_fault('RETR', drop_after=100000)
+        fetch_system_library(server.host, "libSceAgc.sprx", server.port)
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import contextlib
+import socketserver
+
+KiB = 1 << 10
+MiB = 1 << 20
+
+STANDIN_LIBS = [
+    "libSceAgc.sprx", "libSceAgcDriver.sprx", "libSceNpAuth.sprx",
+    "libSceNpAuthAuthorizedAppDialog.sprx", "libSceSaveData.native.sprx"
+]
+# Where build_ps5_layout puts the source folders of generated games, in turn
+STANDIN_GAME_ROOTS = ["data/etaHEN/games", "data/games", "mnt/usb0/games", "mnt/usb1/homebrew"]
+
+def build_ps5_layout(root, games=8, lib_size=2 * MiB, cover_size=64 * KiB, seed=1337):
+    """
+    Populate `root` like a console running ftpsrv-ps5: each game is installed
+    in /user/app/<title_id> (param.json, icon0.png) with its source folder in
+    one of STANDIN_GAME_ROOTS, and /system/common/lib holds STANDIN_LIBS as
+    ELF files of `lib_size` bytes. Returns the generated title ids.
+    """
+    rng = random.Random(seed)
+    for path in ["user/app", "system/common/lib", "data/etaHEN", "mnt/ext0"] + [f"mnt/usb{n}" for n in range(2)]:
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+    title_ids = []
+    for number in range(games):
+        title_id = f"PPSA{10000 + number:05d}"
+        title_ids.append(title_id)
+        sce_sys = os.path.join(root, "user/app", title_id, "sce_sys")
+        os.makedirs(sce_sys, exist_ok=True)
+        with open(os.path.join(sce_sys, "param.json"), 'w') as f:
+            json.dump({"titleId": title_id, "contentId": f"UP0000-{title_id}_00-STANDIN0000000000",
+                       "title": f"Stand-in Game {number}"}, f)
+        with open(os.path.join(sce_sys, "icon0.png"), 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + rng.randbytes(cover_size))
+        source = os.path.join(root, STANDIN_GAME_ROOTS[number % len(STANDIN_GAME_ROOTS)], title_id)
+        os.makedirs(os.path.join(source, "sce_sys"), exist_ok=True)
+        os.makedirs(os.path.join(source, "app0"), exist_ok=True)
+    for lib_name in STANDIN_LIBS:
+        with open(os.path.join(root, "system/common/lib", lib_name), 'wb') as f:
+            f.write(b'\x7fELF' + rng.randbytes(lib_size - 4))
+    return title_ids
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    """One control connection; see FtpStandIn for the supported commands"""
+
+    def setup(self):
+        super().setup()
+        self.standin = self.server.standin
+        self.cwd = '/'
+        self.rest = 0
+        self.rename_from = None
+        self.passive = None
+
+    # Replies and paths
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('utf-8', 'surrogateescape'))
+
+    def resolve(self, path):
+        """(virtual path, local path) of a client path, confined to the root"""
+        virtual = os.path.normpath(os.path.join(self.cwd, path or '.')).replace('\\', '/')
+        virtual = '/' + virtual.lstrip('/')
+        return virtual, os.path.join(self.standin.root, virtual.lstrip('/'))
+
+    def handle(self):
+        if not self.standin._open_connection():
+            self.reply("421 Too many connections, try again later.")
+            return
+        try:
+            self.reply("220 ftpsrv stand-in ready.")
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                line = line.decode('utf-8', 'surrogateescape').rstrip('\r\n')
+                command, _, arg = line.partition(' ')
+                command = command.upper()
+                self.standin._count(command)
+                if self.standin.latency:
+                    time.sleep(self.standin.latency)
+                fault = self.standin._take_fault(command, arg)
+                if fault and fault.get("reply"):
+                    self.reply(fault["reply"])
+                    if fault.get("close"):
+                        return
+                    continue
+                if fault and fault.get("close"):
+                    return
+                handler = getattr(self, f"ftp_{command}", None)
+                if handler is None:
+                    self.reply(f"502 Command '{command}' not implemented.")
+                    continue
+                if command != 'REST':
+                    rest, self.rest = self.rest, 0
+                else:
+                    rest = 0
+                try:
+                    if handler(arg, rest, fault) is False:
+                        return
+                except OSError as e:
+                    self.reply(f"550 {e.strerror or e}.")
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._close_passive()
+            self.standin._close_connection()
+
+    # Session commands
+
+    def ftp_USER(self, arg, rest, fault):
+        self.reply("331 Password required.")
+
+    def ftp_PASS(self, arg, rest, fault):
+        self.standin._count("login")
+        self.reply("230 Login successful.")
+
+    def ftp_SYST(self, arg, rest, fault):
+        self.reply("215 UNIX Type: L8")
+
+    def ftp_FEAT(self, arg, rest, fault):
+        features = ["SIZE", "MDTM", "REST STREAM"] + (["MLST type*;size*;modify*;"] if self.standin.mlsd else [])
+        self.reply("211-Features:")
+        for feature in features:
+            self.reply(" " + feature)
+        self.reply("211 End")
+
+    def ftp_OPTS(self, arg, rest, fault):
+        self.reply("200 OK.")
+
+    def ftp_TYPE(self, arg, rest, fault):
+        self.reply(f"200 Type set to {arg.upper() or 'I'}.")
+
+    def ftp_NOOP(self, arg, rest, fault):
+        self.reply("200 NOOP ok.")
+
+    def ftp_QUIT(self, arg, rest, fault):
+        self.reply("221 Goodbye.")
+        return False
+
+    def ftp_PWD(self, arg, rest, fault):
+        self.reply(f'257 "{self.cwd}" is the current directory.')
+
+    def ftp_CWD(self, arg, rest, fault):
+        virtual, local = self.resolve(arg)
+        if not os.path.isdir(local):
+            self.reply("550 No such directory.")
+            return
+        self.cwd = virtual
+        self.reply("250 Directory changed.")
+
+    def ftp_CDUP(self, arg, rest, fault):
+        self.ftp_CWD('..', rest, fault)
+
+    def ftp_MKD(self, arg, rest, fault):
+        virtual, local = self.resolve(arg)
+        os.mkdir(local)
+        self.reply(f'257 "{virtual}" created.')
+
+    def ftp_RMD(self, arg, rest, fault):
+        os.rmdir(self.resolve(arg)[1])
+        self.reply("250 Directory removed.")
+
+    def ftp_DELE(self, arg, rest, fault):
+        os.remove(self.resolve(arg)[1])
+        self.reply("250 File removed.")
+
+    def ftp_RNFR(self, arg, rest, fault):
+        local = self.resolve(arg)[1]
+        if not os.path.exists(local):
+            self.reply("550 No such file or directory.")
+            return
+        self.rename_from = local
+        self.reply("350 Ready for RNTO.")
+
+    def ftp_RNTO(self, arg, rest, fault):
+        if not self.rename_from:
+            self.reply("503 RNFR required first.")
+            return
+        os.replace(self.rename_from, self.resolve(arg)[1])
+        self.rename_from = None
+        self.reply("250 Rename successful.")
+
+    def ftp_SIZE(self, arg, rest, fault):
+        local = self.resolve(arg)[1]
+        if not os.path.isfile(local):
+            self.reply("550 No such file.")
+            return
+        self.reply(f"213 {os.path.getsize(local)}")
+
+    def ftp_MDTM(self, arg, rest, fault):
+        local = self.resolve(arg)[1]
+        if not os.path.isfile(local):
+            self.reply("550 No such file.")
+            return
+        self.reply("213 " + time.strftime("%Y%m%d%H%M%S", time.gmtime(os.path.getmtime(local))))
+
+    def ftp_REST(self, arg, rest, fault):
+        if not self.standin.rest:
+            self.reply("502 REST not supported.")
+            return
+        self.rest = int(arg)
+        self.reply(f"350 Restarting at {self.rest}.")
+
+    # Data connections
+
+    def ftp_PASV(self, arg, rest, fault):
+        self._close_passive()
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind((self.standin.host, 0))
+        listener.listen(1)
+        listener.settimeout(10)
+        self.passive = listener
+        host, port = listener.getsockname()
+        self.reply(f"227 Entering Passive Mode ({host.replace('.', ',')},{port >> 8},{port & 0xFF}).")
+
+    def _close_passive(self):
+        if self.passive:
+            self.passive.close()
+            self.passive = None
+
+    @contextlib.contextmanager
+    def data_connection(self):
+        if not self.passive:
+            raise ConnectionAbortedError("no PASV")
+        listener, self.passive = self.passive, None
+        try:
+            connection, _ = listener.accept()
+        finally:
+            listener.close()
+        try:
+            yield connection
+        finally:
+            with contextlib.suppress(OSError):
+                connection.shutdown(socket.SHUT_RDWR)
+            connection.close()
+
+    def _send(self, connection, data, fault):
+        """Send with the bandwidth cap; a drop_after fault cuts the connection mid-transfer"""
+        limit = fault.get("drop_after") if fault else None
+        sent = 0
+        view = memoryview(data)
+        chunk_size = 64 * KiB
+        started = time.monotonic()
+        while sent < len(view):
+            chunk = view[sent:sent + chunk_size]
+            if limit is not None and sent + len(chunk) > limit:
+                connection.sendall(chunk[:max(0, limit - sent)])
+                return False
+            connection.sendall(chunk)
+            sent += len(chunk)
+            self._throttle(sent, started)
+        return True
+
+    def _throttle(self, transferred, started):
+        if self.standin.bandwidth:
+            delay = transferred / self.standin.bandwidth - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _transfer_listing(self, lines, fault):
+        if not self.passive:
+            self.reply("425 Use PASV first.")
+            return
+        self.reply("150 Opening data connection.")
+        with self.data_connection() as connection:
+            complete = self._send(connection, ''.join(line + '\r\n' for line in lines).encode('utf-8', 'surrogateescape'), fault)
+        self.reply("226 Transfer complete." if complete else "426 Connection closed; transfer aborted.")
+
+    def _listing(self, arg):
+        local = self.resolve(arg)[1]
+        if not os.path.isdir(local):
+            raise FileNotFoundError(2, "No such directory")
+        return [(name, os.stat(os.path.join(local, name))) for name in sorted(os.listdir(local))]
+
+    def ftp_LIST(self, arg, rest, fault):
+        if arg.startswith('-'):
+            arg = ''
+        lines = []
+        for name, st in self._listing(arg):
+            is_dir = os.path.isdir(os.path.join(self.resolve(arg)[1], name))
+            stamp = time.strftime("%b %d %H:%M", time.gmtime(st.st_mtime))
+            lines.append(f"{'d' if is_dir else '-'}rwxr-xr-x 1 root root {st.st_size} {stamp} {name}")
+        self._transfer_listing(lines, fault)
+
+    def ftp_NLST(self, arg, rest, fault):
+        self._transfer_listing([name for name, _ in self._listing(arg)], fault)
+
+    def ftp_MLSD(self, arg, rest, fault):
+        if not self.standin.mlsd:
+            self.reply("500 Unknown command MLSD.")
+            return
+        lines = []
+        for name, st in self._listing(arg):
+            is_dir = os.path.isdir(os.path.join(self.resolve(arg)[1], name))
+            modify = time.strftime("%Y%m%d%H%M%S", time.gmtime(st.st_mtime))
+            lines.append(f"type={'dir' if is_dir else 'file'};size={st.st_size};modify={modify}; {name}")
+        self._transfer_listing(lines, fault)
+
+    def ftp_RETR(self, arg, rest, fault):
+        local = self.resolve(arg)[1]
+        if not os.path.isfile(local):
+            self.reply("550 No such file or directory.")
+            return
+        if not self.passive:
+            self.reply("425 Use PASV first.")
+            return
+        with open(local, 'rb') as f:
+            f.seek(rest)
+            data = f.read()
+        self.reply("150 Opening BINARY mode data connection.")
+        with self.data_connection() as connection:
+            complete = self._send(connection, data, fault)
+        self.standin._count("bytes_sent", len(data))
+        self.reply("226 Transfer complete." if complete else "426 Connection closed; transfer aborted.")
+
+    def _store(self, arg, rest, fault, append):
+        local = self.resolve(arg)[1]
+        if not os.path.isdir(os.path.dirname(local)):
+            self.reply("550 No such file or directory.")
+            return
+        if not self.passive:
+            self.reply("425 Use PASV first.")
+            return
+        limit = fault.get("drop_after") if fault else None
+        mode = 'ab' if append else ('r+b' if rest and os.path.exists(local) else 'wb')
+        self.reply("150 Ok to send data.")
+        received = 0
+        complete = True
+        with self.data_connection() as connection, open(local, mode) as f:
+            if not append:
+                f.seek(rest)
+                f.truncate()
+            started = time.monotonic()
+            while True:
+                data = connection.recv(64 * KiB)
+                if not data:
+                    break
+                if limit is not None and received + len(data) > limit:
+                    f.write(data[:max(0, limit - received)])
+                    complete = False
+                    break
+                f.write(data)
+                received += len(data)
+                self._throttle(received, started)
+        self.standin._count("bytes_received", received)
+        self.reply("226 Transfer complete." if complete else "426 Connection closed; transfer aborted.")
+
+    def ftp_STOR(self, arg, rest, fault):
+        self._store(arg, rest, fault, append=False)
+
+    def ftp_APPE(self, arg, rest, fault):
+        self._store(arg, rest, fault, append=True)
+
+class _StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class FtpStandIn:
+    """
+    In-process FTP server standing in for ftpsrv-ps5 on the console.
+
+    Accepts any login and supports USER/PASS, CWD/CDUP/PWD, MKD/RMD/DELE,
+    RNFR/RNTO, LIST/NLST/MLSD, RETR, STOR/APPE, REST, SIZE, MDTM, NOOP and
+    QUIT over passive data connections.
+
+    Args:
+        root: folder to serve; a temporary one with build_ps5_layout() is
+            created (and removed by stop()) when omitted
+        latency: seconds slept before answering every command
+        bandwidth: bytes per second per data connection (None = unlimited)
+        max_connections: control connections above this get "421" (None = unlimited)
+        mlsd: False makes MLSD reply 500, like servers that only know LIST
+        rest: False makes REST reply 502
+        layout: keyword arguments for build_ps5_layout()
+    """
+
+    def __init__(self, root=None, host='127.0.0.1', port=0, latency=0.0, bandwidth=None,
+                 max_connections=None, mlsd=True, rest=True, layout=None):
+        self._own_root = root is None
+        self.root = root or tempfile.mkdtemp(prefix="ftp-standin-")
+        self.title_ids = build_ps5_layout(self.root, **(layout or {})) if self._own_root else []
+        self.host = host
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.max_connections = max_connections
+        self.mlsd = mlsd
+        self.rest = rest
+        self.stats = {}
+        self._faults = []
+        self._connections = 0
+        self._lock = threading.Lock()
+        self._server = _StandInServer((host, port), _StandInHandler, bind_and_activate=True)
+        self._server.standin = self
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.1},
+                                        name=f"ftp-standin-{self.port}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._own_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def inject_fault(self, command, path=None, reply=None, drop_after=None, close=False, times=1):
+        """
+        Make the next `times` matching commands fail (times=None: every one).
+
+        `path` narrows the match to commands whose argument ends with it.
+        `reply` answers with that line instead of running the command (e.g.
+        "421 Timeout"); `close` drops the control connection (after `reply`,
+        if any); `drop_after` cuts a RETR/STOR/APPE/LIST data transfer after
+        that many bytes and answers 426.
+        """
+        with self._lock:
+            self._faults.append({"command": command.upper(), "path": path, "reply": reply,
+                                 "drop_after": drop_after, "close": close, "times": times})
+
+    def clear_faults(self):
+        with self._lock:
+            self._faults.clear()
+
+    def _take_fault(self, command, arg):
+        with self._lock:
+            for fault in self._faults:
+                if fault["command"] == command and (fault["path"] is None or arg.endswith(fault["path"])):
+                    if fault["times"] is not None:
+                        fault["times"] -= 1
+                        if fault["times"] <= 0:
+                            self._faults.remove(fault)
+                    return fault
+        return None
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + amount
+
+    def _open_connection(self):
+        with self._lock:
+            if self.max_connections is not None and self._connections >= self.max_connections:
+                self.stats["refused"] = self.stats.get("refused", 0) + 1
+                return False
+            self._connections += 1
+            self.stats["connections"] = self.stats.get("connections", 0) + 1
+            return True
+
+    def _close_connection(self):
+        with self._lock:
+            self._connections -= 1
+
+def run_ftp_benchmark(latency=0.02, bandwidth=None, games=16, lib_size=2 * MiB, repeat=1):
+    """
+    Time list_installed_games, find_game_source_directory,
+    fetch_system_library and upload_patched_library against a fresh
+    stand-in. Manager caches (cover cache, game index) are pointed at a
+    temporary folder so every run starts cold.
+    """
+    from src import backpork_manager as manager
+
+    saved = {name: getattr(manager, name) for name in
+             ("CACHE_DIR", "GAME_INDEX_PATH", "COVERS_CACHE_DIR", "COVER_INDEX_PATH")}
+    work_dir = tempfile.mkdtemp(prefix="ftp-bench-")
+    cases = []
+    try:
+        manager.CACHE_DIR = work_dir
+        manager.GAME_INDEX_PATH = os.path.join(work_dir, "game_index.json")
+        manager.COVERS_CACHE_DIR = os.path.join(work_dir, "covers")
+        manager.COVER_INDEX_PATH = os.path.join(manager.COVERS_CACHE_DIR, "index.json")
+        layout = {"games": games, "lib_size": lib_size}
+        with FtpStandIn(latency=latency, bandwidth=bandwidth, layout=layout) as server:
+            ip, port = server.host, server.port
+            fakelib = f"/data/etaHEN/games/{server.title_ids[0]}/fakelib"
+            os.makedirs(os.path.join(server.root, fakelib.lstrip('/')), exist_ok=True)
+            steps = [
+                ("list_installed_games", lambda: manager.list_installed_games(ip, port)),
+                ("find_game_source_directory", lambda: manager.find_game_source_directory(ip, port, server.title_ids[-1])),
+                ("fetch_system_library", lambda: manager.fetch_system_library(ip, STANDIN_LIBS[0], port)),
+                ("upload_patched_library", lambda: manager.upload_patched_library(
+                    ip, port, os.path.join(work_dir, STANDIN_LIBS[0]), f"{fakelib}/{STANDIN_LIBS[0]}")),
+            ]
+            for name, step in steps:
+                best = None
+                for _ in range(repeat):
+                    manager._game_index = None
+                    manager._cover_index = None
+                    manager.forget_game_source(ip)
+                    logins = server.stats.get("login", 0)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        start = time.perf_counter()
+                        result = step()
+                        elapsed = time.perf_counter() - start
+                    if not result.get("success"):
+                        raise RuntimeError(f"{name} failed: {result.get('error')}")
+                    best = elapsed if best is None else min(best, elapsed)
+                case = {"name": name, "seconds": best, "logins": server.stats.get("login", 0) - logins}
+                cases.append(case)
+                print(f"[BENCH] {name:<28} {best:8.3f}s  logins {case['logins']}")
+                sys.stdout.flush()
+            manager.ftp_pool.close(ip, port)
+    finally:
+        for name, value in saved.items():
+            setattr(manager, name, value)
+        manager._game_index = None
+        manager._cover_index = None
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "latency": latency,
+        "bandwidth": bandwidth,
+        "games": games,
+        "lib_size": lib_size,
+        "cases": cases,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local ftpsrv-ps5 stand-in for offline testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2121)
+    parser.add_argument('--root', help="folder to serve (default: a generated console layout)")
+    parser.add_argument('--latency', type=float, default=0.0, help="milliseconds added to every command")
+    parser.add_argument('--bandwidth', type=float, help="KiB/s per data connection")
+    parser.add_argument('--max-connections', type=int, help="refuse control connections above this")
+    parser.add_argument('--no-mlsd', action='store_true', help="answer MLSD with 500 (LIST only)")
+    parser.add_argument('--games', type=int, default=8, help="games in the generated layout")
+    parser.add_argument('--lib-size', type=int, default=2048, help="size of each system library in KiB")
+    parser.add_argument('--benchmark', action='store_true', help="time the manager's FTP paths and exit")
+    parser.add_argument('--repeat', type=int, default=1, help="benchmark runs per step, best is kept")
+    parser.add_argument('--output', help="write benchmark results to this JSON file")
+    args = parser.parse_args(argv)
+
+    latency = args.latency / 1000
+    bandwidth = int(args.bandwidth * KiB) if args.bandwidth else None
+    if args.benchmark:
+        results = run_ftp_benchmark(latency, bandwidth, args.games, args.lib_size * KiB, args.repeat)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"[BENCH] Results written to {args.output}")
+        return 0
+
+    server = FtpStandIn(args.root, args.host, args.port, latency, bandwidth, args.max_connections,
+                        mlsd=not args.no_mlsd, layout={"games": args.games, "lib_size": args.lib_size * KiB})
+    print(f"[STANDIN] Serving {server.root} on {server.host}:{server.port} "
+          f"(latency {args.latency:g} ms, bandwidth {args.bandwidth or 'unlimited'} KiB/s)")
+    if server.title_ids:
+        print(f"[STANDIN] Games: {', '.join(server.title_ids)}")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,7 +9,7 @@ const REQUIRED_LIBS = [
     { name: 'libSceSaveData.native.sprx', display: 'libSceSaveData.native.sprx' }
 ];
 
-async function refreshGames() {
+async function refreshGames(force = false) {
     const gamesList = document.getElementById('games-list');
     gamesList.innerHTML = '<div class="flex flex-col items-center justify-center py-16 text-white/50"><i class="fa-solid fa-spinner fa-spin text-3xl mb-3"></i><p class="text-sm">Scanning for games…</p></div>';
     
@@ -37,7 +37,7 @@ async function refreshGames() {
             showToast('Please set PS5 IP address in Settings first', 'warning');
             return;
         }
-        const response = await fetch('/api/backpork/list_games', {
+        const response = await fetch('/api/backpork/list_games' + (force ? '?refresh=1' : ''), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' }
         });
@@ -81,6 +81,11 @@ async function refreshGames() {
         
         if (data.success && data.games && data.games.length > 0) {
             gamesList.innerHTML = '';
+            const gamesAge = document.getElementById('games-age');
+            if (gamesAge && typeof data.age === 'number') {
+                gamesAge.textContent = `· updated ${formatAge(data.age)} ago`;
+                gamesAge.title = data.error ? `Last refresh failed: ${data.error}` : '';
+            }
             data.games.forEach(game => {
                 const gameCard = document.createElement('div');
                 gameCard.className = 'ps5-card p-3 cursor-pointer group';
@@ -253,6 +258,20 @@ async function createFakelibFolder(game) {
     }
 }
 
+const JOB_STORAGE_KEY = 'backpork.jobId';
+let jobEvents = null;
+
+function setProcessingBusy(busy, count = 0) {
+    const btn = document.getElementById('btn-process-libraries');
+    const cancelBtn = document.getElementById('btn-cancel-job');
+    btn.disabled = busy;
+    btn.innerHTML = busy
+        ? `<i class="fa-solid fa-spinner fa-spin"></i> Processing${count ? ` ${count}` : ''}…`
+        : '<i class="fa-solid fa-magic mr-2"></i>Process & Upload Libraries';
+    cancelBtn.classList.toggle('hidden', !busy);
+    cancelBtn.disabled = false;
+}
+
 async function processLibraries() {
     if (!selectedGame) {
         showToast('Please select a game first', 'error');
@@ -267,16 +286,15 @@ async function processLibraries() {
     }
     
     const firmware = document.querySelector('input[name="firmware"]:checked').value;
-    const btn = document.getElementById('btn-process-libraries');
     const statusDiv = document.getElementById('processing-status');
     
-    btn.disabled = true;
-    btn.innerHTML = `<i class="fa-solid fa-spinner fa-spin"></i> Processing ${selectedLibs.length}…`;
+    setProcessingBusy(true, selectedLibs.length);
     statusDiv.classList.remove('hidden');
     statusDiv.innerHTML = `<div class="text-sm text-white/60 flex items-center gap-2"><i class="fa-solid fa-spinner fa-spin"></i> Starting (${selectedLibs.length} selected)…</div>`;
     
     try {
-        const response = await fetch('/api/backpork/process_libraries', {
+        // Runs as a background job; progress arrives over Server-Sent Events
+        const response = await fetch('/api/backpork/jobs', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -286,7 +304,214 @@ async function processLibraries() {
             })
         });
         
-        // Check if response is OK and is JSON
+        let data;
+        try {
+            data = await response.json();
+        } catch (jsonError) {
+            throw new Error(`Server error: ${response.status} ${response.statusText}`);
+        }
+        if (!response.ok || !data.success) {
+            throw new Error(data.error || `Server error: ${response.status} ${response.statusText}`);
+        }
+        
+        localStorage.setItem(JOB_STORAGE_KEY, data.job.id);
+        watchJob(data.job.id, true);
+    } catch (error) {
+        showToast('Error: ' + error.message, 'error');
+        statusDiv.innerHTML = `<div class="text-sm text-red-400 p-3 bg-red-500/20 rounded-lg border border-red-500/30">Error: ${escapeHtml(error.message)}</div>`;
+        setProcessingBusy(false);
+    }
+}
+
+function watchJob(jobId, live = false) {
+    // live: started from this page, so announce the outcome with a toast
+    if (jobEvents) jobEvents.close();
+    const statusDiv = document.getElementById('processing-status');
+    let job = null;
+    
+    jobEvents = new EventSource(`/api/backpork/jobs/${encodeURIComponent(jobId)}/events`);
+    jobEvents.addEventListener('snapshot', event => {
+        job = JSON.parse(event.data);
+        if (isJobFinished(job.status)) {
+            finishJob(jobId, live);
+            return;
+        }
+        setProcessingBusy(true, job.libraries.length);
+        statusDiv.classList.remove('hidden');
+        renderJobProgress(job);
+    });
+    ['stage', 'transfer', 'library'].forEach(type => {
+        jobEvents.addEventListener(type, event => {
+            const update = JSON.parse(event.data);
+            const lib = job && job.libraries.find(l => l.library === update.library);
+            if (!lib) return;
+            if (type === 'stage') {
+                Object.assign(lib, { stage: update.stage, bytes: 0, total: null });
+            } else if (type === 'transfer') {
+                Object.assign(lib, { bytes: update.bytes, total: update.total });
+            } else {
+                Object.assign(lib, { success: update.success, message: update.message, duration: update.duration });
+            }
+            renderJobProgress(job);
+        });
+    });
+    jobEvents.addEventListener('cancelling', () => {
+        document.getElementById('btn-cancel-job').disabled = true;
+    });
+    jobEvents.addEventListener('status', event => {
+        const update = JSON.parse(event.data);
+        if (!job) return;
+        job.status = update.status;
+        if (isJobFinished(update.status)) {
+            finishJob(jobId, live);
+        } else {
+            renderJobProgress(job);
+        }
+    });
+    jobEvents.addEventListener('end', () => jobEvents.close());
+    jobEvents.onerror = () => {
+        // The browser reconnects by itself; a closed stream means the job is gone
+        if (jobEvents.readyState === EventSource.CLOSED && !job) {
+            localStorage.removeItem(JOB_STORAGE_KEY);
+            setProcessingBusy(false);
+        }
+    };
+}
+
+function isJobFinished(status) {
+    return ['succeeded', 'failed', 'cancelled'].includes(status);
+}
+
+function formatBytes(bytes) {
+    if (bytes < 1024 * 1024) return `${Math.round(bytes / 1024)} KiB`;
+    return `${(bytes / (1024 * 1024)).toFixed(1)} MiB`;
+}
+
+function renderJobProgress(job) {
+    const statusDiv = document.getElementById('processing-status');
+    const header = job.status === 'queued'
+        ? 'Queued, waiting for the current job…'
+        : `Processing ${job.libraries.length} ${job.libraries.length === 1 ? 'library' : 'libraries'}…`;
+    statusDiv.innerHTML = `<div class="text-sm text-white/60 flex items-center gap-2"><i class="fa-solid fa-spinner fa-spin"></i> ${header}</div>` +
+        job.libraries.map(lib => {
+            const done = lib.success !== null && lib.success !== undefined;
+            const icon = !done ? 'fa-spinner fa-spin text-ps5-blue' : (lib.success ? 'fa-circle-check text-emerald-400' : 'fa-circle-xmark text-red-400');
+            const percent = lib.total ? Math.min(100, Math.round(100 * lib.bytes / lib.total)) : null;
+            return `
+                <div class="p-3 rounded-xl bg-white/5 border border-white/5">
+                    <div class="flex items-center gap-3">
+                        <i class="fa-solid ${icon} text-base flex-shrink-0"></i>
+                        <span class="text-sm font-semibold font-mono text-white/90 flex-1 min-w-0 truncate">${escapeHtml(lib.library)}</span>
+                        <span class="text-xs text-white/50">${escapeHtml(done ? (lib.duration !== null ? `${lib.duration.toFixed(1)}s` : '') : (lib.stage || 'Waiting'))}</span>
+                    </div>
+                    ${!done && percent !== null ? `
+                        <div class="mt-2 h-1.5 rounded-full bg-white/10 overflow-hidden">
+                            <div class="h-full bg-ps5-blue" style="width: ${percent}%"></div>
+                        </div>
+                        <div class="mt-1 text-xs text-white/40">${formatBytes(lib.bytes)} of ${formatBytes(lib.total)}</div>
+                    ` : ''}
+                </div>
+            `;
+        }).join('');
+}
+
+async function finishJob(jobId, live) {
+    if (jobEvents) jobEvents.close();
+    const statusDiv = document.getElementById('processing-status');
+    try {
+        const response = await fetch(`/api/backpork/jobs/${encodeURIComponent(jobId)}`);
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error || 'Unknown job');
+        const job = data.job;
+        statusDiv.classList.remove('hidden');
+        if (job.results) {
+            renderProcessResults(job.results);
+        } else {
+            statusDiv.innerHTML = `<div class="text-sm ${job.status === 'cancelled' ? 'text-white/60 bg-white/5 border-white/10' : 'text-red-400 bg-red-500/20 border-red-500/30'} p-3 rounded-lg border">${escapeHtml(job.error || (job.status === 'cancelled' ? 'Cancelled before it started' : 'Job failed'))}</div>`;
+        }
+        if (live) {
+            if (job.status === 'cancelled') {
+                showToast('Processing cancelled', 'warning');
+            } else if (job.status === 'succeeded') {
+                const skipped = job.sync ? job.sync.skipped : 0;
+                showToast(skipped ? `All libraries processed successfully! (${skipped} already up to date, upload skipped)` : 'All libraries processed successfully!', 'success');
+            } else {
+                showToast(job.error || 'Some libraries failed to process. Check details below.', 'warning');
+            }
+        }
+    } catch (error) {
+        if (live) showToast('Error: ' + error.message, 'error');
+        statusDiv.innerHTML = `<div class="text-sm text-red-400 p-3 bg-red-500/20 rounded-lg border border-red-500/30">Error: ${escapeHtml(error.message)}</div>`;
+    } finally {
+        setProcessingBusy(false);
+    }
+}
+
+async function cancelJob() {
+    const jobId = localStorage.getItem(JOB_STORAGE_KEY);
+    if (!jobId) return;
+    document.getElementById('btn-cancel-job').disabled = true;
+    try {
+        const response = await fetch(`/api/backpork/jobs/${encodeURIComponent(jobId)}/cancel`, { method: 'POST' });
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error || 'Could not cancel');
+    } catch (error) {
+        showToast('Error: ' + error.message, 'error');
+        document.getElementById('btn-cancel-job').disabled = false;
+    }
+}
+
+function renderProcessResults(results) {
+    const statusDiv = document.getElementById('processing-status');
+    statusDiv.innerHTML = '';
+    results.forEach(result => {
+        const statusItem = document.createElement('div');
+        statusItem.className = `p-3 rounded-xl ${result.success ? 'bg-emerald-500/10 border border-emerald-500/20' : 'bg-red-500/10 border border-red-500/20'}`;
+        
+        const formattedMessage = escapeHtml(result.message || result.error || 'Unknown error').replace(/\n/g, '<br>');
+        
+        statusItem.innerHTML = `
+            <div class="flex items-start gap-3">
+                <i class="fa-solid ${result.success ? 'fa-circle-check text-emerald-400' : 'fa-circle-xmark text-red-400'} text-base mt-0.5 flex-shrink-0"></i>
+                <div class="flex-1 min-w-0">
+                    <div class="flex items-center gap-2 mb-1">
+                        <span class="text-sm font-semibold font-mono text-white/90">${escapeHtml(result.library)}</span>
+                        ${result.steps ? `<span class="text-xs text-white/40">${result.steps.length} steps</span>` : ''}
+                    </div>
+                    <div class="text-xs text-white/70">${formattedMessage}</div>
+                    ${result.steps && result.steps.length > 0 ? `
+                        <div class="mt-2 space-y-1">
+                            ${result.steps.map(step => `
+                                <div class="text-xs text-white/50 flex items-center gap-2">
+                                    <i class="fa-solid ${step.success ? 'fa-check text-emerald-400' : 'fa-times text-red-400'} text-xs"></i>
+                                    <span>${escapeHtml(step.name)}</span>
+                                    ${step.duration !== undefined ? `<span class="text-white/30">${step.duration.toFixed(1)}s</span>` : ''}
+                                    ${step.error ? `<span class="text-red-400">${escapeHtml(step.error)}</span>` : ''}
+                                </div>
+                            `).join('')}
+                        </div>
+                    ` : ''}
+                </div>
+            </div>
+        `;
+        statusDiv.appendChild(statusItem);
+    });
+}
+
+async function precheckFirmware() {
+    const btn = document.getElementById('btn-precheck');
+    const statusDiv = document.getElementById('precheck-status');
+    btn.disabled = true;
+    btn.innerHTML = '<i class="fa-solid fa-spinner fa-spin"></i> Checking…';
+    statusDiv.classList.remove('hidden');
+    statusDiv.innerHTML = '<div class="text-xs text-white/60 flex items-center gap-2"><i class="fa-solid fa-spinner fa-spin"></i> Reading system libraries…</div>';
+    
+    try {
+        const response = await fetch('/api/backpork/precheck', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ libraries: REQUIRED_LIBS.map(lib => lib.name) })
+        });
         if (!response.ok) {
             let errorText = '';
             try {
@@ -296,87 +521,46 @@ async function processLibraries() {
             }
             throw new Error(`Server error: ${response.status} ${response.statusText}. ${errorText.substring(0, 200)}`);
         }
-        
-        const contentType = response.headers.get('content-type') || '';
-        let responseText = '';
-        try {
-            responseText = await response.clone().text();
-        } catch (e) {
-            // If we can't clone, we'll try to read it directly below
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error || 'Precheck failed');
         }
         
-        if (!contentType.includes('application/json')) {
-            console.error('[BACKPORK] Non-JSON response detected:', {
-                contentType,
-                status: response.status,
-                preview: responseText.substring(0, 200)
-            });
-            throw new Error(`Expected JSON but got ${contentType || 'unknown'}. Response preview: ${responseText.substring(0, 200)}`);
-        }
-        
-        let data;
-        try {
-            data = await response.json();
-        } catch (jsonError) {
-            console.error('[BACKPORK] JSON parse error:', jsonError);
-            console.error('[BACKPORK] Response text:', responseText || 'Could not read response');
-            throw new Error(`Failed to parse JSON response: ${jsonError.message}. Response preview: ${(responseText || 'Could not read').substring(0, 200)}`);
-        }
+        statusDiv.innerHTML = data.libraries.map(lib => `
+            <div class="flex items-center gap-2 text-xs">
+                <span class="flex-1 min-w-0 truncate font-mono text-white/70">${escapeHtml(lib.library)}</span>
+                ${data.firmwares.map(fw => {
+                    const check = lib.firmwares[fw] || {};
+                    return `<span class="${check.compatible ? 'text-emerald-400' : 'text-red-400'}" title="${escapeHtml(check.error || lib.error || '')}">
+                        <i class="fa-solid ${check.compatible ? 'fa-check' : 'fa-times'}"></i> ${escapeHtml(fw)}
+                    </span>`;
+                }).join('')}
+            </div>
+        `).join('');
         
-        if (data.success) {
-            statusDiv.innerHTML = '';
-            data.results.forEach(result => {
-                const statusItem = document.createElement('div');
-                statusItem.className = `p-3 rounded-xl ${result.success ? 'bg-emerald-500/10 border border-emerald-500/20' : 'bg-red-500/10 border border-red-500/20'}`;
-                
-                const formattedMessage = escapeHtml(result.message || result.error || 'Unknown error').replace(/\n/g, '<br>');
-                
-                statusItem.innerHTML = `
-                    <div class="flex items-start gap-3">
-                        <i class="fa-solid ${result.success ? 'fa-circle-check text-emerald-400' : 'fa-circle-xmark text-red-400'} text-base mt-0.5 flex-shrink-0"></i>
-                        <div class="flex-1 min-w-0">
-                            <div class="flex items-center gap-2 mb-1">
-                                <span class="text-sm font-semibold font-mono text-white/90">${escapeHtml(result.library)}</span>
-                                ${result.steps ? `<span class="text-xs text-white/40">${result.steps.length} steps</span>` : ''}
-                            </div>
-                            <div class="text-xs text-white/70">${formattedMessage}</div>
-                            ${result.steps && result.steps.length > 0 ? `
-                                <div class="mt-2 space-y-1">
-                                    ${result.steps.map(step => `
-                                        <div class="text-xs text-white/50 flex items-center gap-2">
-                                            <i class="fa-solid ${step.success ? 'fa-check text-emerald-400' : 'fa-times text-red-400'} text-xs"></i>
-                                            <span>${escapeHtml(step.name)}</span>
-                                            ${step.error ? `<span class="text-red-400">${escapeHtml(step.error)}</span>` : ''}
-                                        </div>
-                                    `).join('')}
-                                </div>
-                            ` : ''}
-                        </div>
-                    </div>
-                `;
-                statusDiv.appendChild(statusItem);
-            });
-            
-            const allSuccess = data.results.every(r => r.success);
-            if (allSuccess) {
-                showToast('All libraries processed successfully!', 'success');
-            } else {
-                showToast('Some libraries failed to process. Check details below.', 'warning');
-            }
+        if (data.compatible_firmwares.length > 0) {
+            const fw = data.compatible_firmwares[0];
+            const radio = document.querySelector(`input[name="firmware"][value="${fw}"]`);
+            if (radio) radio.checked = true;
+            showToast(`Libraries match the ${fw} patches`, 'success');
         } else {
-            showToast(data.error || 'Failed to process libraries', 'error');
-            const formattedError = escapeHtml(data.error || 'Unknown error').replace(/\n/g, '<br>');
-            statusDiv.innerHTML = `<div class="text-sm text-red-400 p-3 bg-red-500/20 rounded-lg border border-red-500/30">${formattedError}</div>`;
+            showToast('No firmware patch set matches all libraries on this console', 'warning');
         }
     } catch (error) {
         showToast('Error: ' + error.message, 'error');
-        statusDiv.innerHTML = `<div class="text-sm text-red-400 p-3 bg-red-500/20 rounded-lg border border-red-500/30">Error: ${escapeHtml(error.message)}</div>`;
+        statusDiv.innerHTML = `<div class="text-xs text-red-400">${escapeHtml(error.message)}</div>`;
     } finally {
         btn.disabled = false;
-        btn.innerHTML = '<i class="fa-solid fa-magic mr-2"></i>Process & Upload Libraries';
+        btn.innerHTML = '<i class="fa-solid fa-list-check"></i> Check';
     }
 }
 
+function formatAge(seconds) {
+    if (seconds < 60) return `${Math.round(seconds)}s`;
+    if (seconds < 3600) return `${Math.round(seconds / 60)}m`;
+    return `${Math.round(seconds / 3600)}h`;
+}
+
 function escapeHtml(text) {
     const div = document.createElement('div');
     div.textContent = text;
@@ -459,4 +643,7 @@ async function testFTPConnection() {
 // Load games on page load
 document.addEventListener('DOMContentLoaded', () => {
     refreshGames();
+    // Pick up the last job again after a reload (still running or its results)
+    const jobId = localStorage.getItem(JOB_STORAGE_KEY);
+    if (jobId) watchJob(jobId);
 });
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import backpork_manager
+from src.ftp_standin import FtpStandIn, KiB
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """backpork_manager with its cache in tmp_path and fast FTP retries"""
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(backpork_manager, "CACHE_DIR", str(cache))
+    monkeypatch.setattr(backpork_manager, "PATCHES_CACHE_DIR", str(cache / "patches"))
+    monkeypatch.setattr(backpork_manager, "ARTIFACTS_DIR", str(cache / "artifacts"))
+    monkeypatch.setattr(backpork_manager, "ARTIFACT_INDEX_PATH", str(cache / "artifacts" / "index.json"))
+    monkeypatch.setattr(backpork_manager, "JOBS_PATH", str(cache / "jobs.json"))
+    monkeypatch.setattr(backpork_manager, "_artifact_index", None)
+    monkeypatch.setattr(backpork_manager, "GAME_INDEX_PATH", str(cache / "game_index.json"))
+    monkeypatch.setattr(backpork_manager, "_game_index", None)
+    monkeypatch.setattr(backpork_manager, "COVERS_CACHE_DIR", str(cache / "covers"))
+    monkeypatch.setattr(backpork_manager, "COVER_INDEX_PATH", str(cache / "covers" / "index.json"))
+    monkeypatch.setattr(backpork_manager, "_cover_index", None)
+    monkeypatch.setattr(backpork_manager, "FTP_RETRY_BACKOFF", 0.01)
+    yield backpork_manager
+    backpork_manager.ftp_pool.close()
+
+
+@pytest.fixture
+def standin():
+    with FtpStandIn(layout={"games": 1, "lib_size": 64 * KiB, "cover_size": KiB}) as server:
+        yield server
@@ -0,0 +1,29 @@
+import os
+
+LIB = "libSceAgc.sprx"
+
+
+def lib_size(standin):
+    return os.path.getsize(os.path.join(standin.root, "system", "common", "lib", LIB))
+
+
+def test_half_stamp_is_not_remembered(manager, standin):
+    manager._remember_library_source(standin.host, LIB, (lib_size(standin), None), "0" * 64)
+    manager._remember_library_source(standin.host, LIB, (None, "20250101000000"), "0" * 64)
+
+    assert manager._load_artifact_index()["sources"] == {}
+
+
+def test_library_without_mdtm_is_fetched(manager, standin, monkeypatch):
+    # Server answers SIZE but not MDTM; an older index still has a size-only entry
+    standin.inject_fault("MDTM", reply="502 Command not implemented.", times=None)
+    manager._load_artifact_index()["sources"][f"{standin.host}/{LIB}"] = {
+        "size": lib_size(standin), "mdtm": None, "sha256": "0" * 64}
+    lookups = []
+    monkeypatch.setattr(manager, "download_patch_from_github", lambda *args: lookups.append(args))
+
+    stamp, artifact = manager._find_library_artifact(standin.host, standin.port, LIB, "6xx", "libSceAgc.bps")
+
+    assert stamp == (lib_size(standin), None)
+    assert artifact is None
+    assert lookups == []
@@ -0,0 +1,119 @@
+import random
+import zlib
+
+import pytest
+
+from src.backpork_manager import (
+    CompiledBpsPatch, apply_bps_patch, apply_bps_patch_file, create_bps_patch,
+    create_bps_patch_file, encode_bps_vli, read_bps_header,
+)
+
+SOURCE_READ, TARGET_READ, SOURCE_COPY, TARGET_COPY = range(4)
+
+
+def blob(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def shuffled(data, seed):
+    # Same blocks as `data` in a different order, to produce SourceCopy runs
+    chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+    random.Random(seed).shuffle(chunks)
+    return b''.join(chunks)
+
+
+CASES = {
+    "empty source": (b'', blob(20000, 1)),
+    "empty target": (blob(20000, 2), b''),
+    "both empty": (b'', b''),
+    "identical": (blob(50000, 3), blob(50000, 3)),
+    "pure insertion": (blob(30000, 4), blob(30000, 4)[:12000] + blob(5000, 5) + blob(30000, 4)[12000:]),
+    "appended tail": (blob(30000, 6), blob(30000, 6) + blob(3000, 7)),
+    "moved blocks": (blob(64 * 1024, 8), shuffled(blob(64 * 1024, 8), 9)),
+    "repeated byte run": (blob(8000, 10), blob(8000, 10)[:4000] + b'\x00' * 50000 + blob(8000, 10)[4000:]),
+    "repeated pattern": (b'', blob(700, 11) * 200),
+    "overlapping runs": (blob(4000, 12), blob(4000, 12) + (b'abc' * 5000) + blob(4000, 12)),
+}
+
+
+def assert_round_trip(source, target, patch):
+    header = read_bps_header(patch)
+    assert header["source_size"] == len(source)
+    assert header["target_size"] == len(target)
+    assert header["source_crc"] == zlib.crc32(source)
+    assert header["target_crc"] == zlib.crc32(target)
+    assert header["patch_crc"] == zlib.crc32(patch[:-4])
+
+    patched, error = apply_bps_patch(source, patch)
+    assert error is None
+    assert patched == target
+
+    compiled = CompiledBpsPatch(patch)
+    assert (compiled.source_crc, compiled.target_crc, compiled.patch_crc) == (
+        header["source_crc"], header["target_crc"], header["patch_crc"])
+    assert compiled.apply(source) == target
+    return compiled
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_create_bps_patch_round_trip(name):
+    source, target = CASES[name]
+    assert_round_trip(source, target, create_bps_patch(source, target))
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_create_bps_patch_file_round_trip(name, tmp_path):
+    source, target = CASES[name]
+    (tmp_path / "source.elf").write_bytes(source)
+    (tmp_path / "target.elf").write_bytes(target)
+
+    result = create_bps_patch_file(str(tmp_path / "source.elf"), str(tmp_path / "target.elf"),
+                                   str(tmp_path / "out.bps"), metadata="round trip")
+
+    assert result["success"], result
+    patch = (tmp_path / "out.bps").read_bytes()
+    assert CompiledBpsPatch(patch).metadata == b"round trip"
+    assert_round_trip(source, target, patch)
+    applied = apply_bps_patch_file(str(tmp_path / "source.elf"), patch, str(tmp_path / "patched.elf"))
+    assert applied["success"], applied
+    assert applied["target_crc"] == f"{zlib.crc32(target):08x}"
+    assert (tmp_path / "patched.elf").read_bytes() == target
+
+
+@pytest.mark.parametrize("name", ["repeated byte run", "repeated pattern", "overlapping runs"])
+def test_repeated_runs_use_target_copy(name):
+    source, target = CASES[name]
+    compiled = assert_round_trip(source, target, create_bps_patch(source, target))
+    assert TARGET_COPY in compiled.action_types
+    assert len(compiled.patch_data) < len(target) // 4
+
+
+def test_identical_inputs_are_a_single_source_read():
+    source, target = CASES["identical"]
+    compiled = assert_round_trip(source, target, create_bps_patch(source, target))
+    assert list(compiled.action_types) == [SOURCE_READ]
+
+
+def test_pure_insertion_reads_only_the_inserted_bytes():
+    source, target = CASES["pure insertion"]
+    compiled = assert_round_trip(source, target, create_bps_patch(source, target))
+    assert TARGET_READ in compiled.action_types
+    assert len(compiled.patch_data) < 5000 + 100
+
+
+def test_moved_blocks_use_source_copy():
+    source, target = CASES["moved blocks"]
+    compiled = assert_round_trip(source, target, create_bps_patch(source, target))
+    assert SOURCE_COPY in compiled.action_types
+
+
+def test_empty_target_has_no_actions():
+    source, target = CASES["empty target"]
+    compiled = assert_round_trip(source, target, create_bps_patch(source, target))
+    assert len(compiled.action_types) == 0
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 16511, 16512, 1 << 32, (1 << 63) + 5])
+def test_encode_bps_vli_round_trip(value):
+    header = b'BPS1' + encode_bps_vli(value) + encode_bps_vli(0) + encode_bps_vli(value + 1) + bytes(12)
+    assert (read_bps_header(header)["source_size"], read_bps_header(header)["metadata_size"]) == (value, value + 1)
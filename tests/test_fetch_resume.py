@@ -0,0 +1,73 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+LIB = "libSceAgc.sprx"
+
+
+def remote_path(standin):
+    return os.path.join(standin.root, "system", "common", "lib", LIB)
+
+
+def fetch(manager, standin, use_async):
+    if use_async:
+        return asyncio.run(manager.fetch_system_library_async(standin.host, LIB, standin.port))
+    return manager.fetch_system_library(standin.host, LIB, standin.port)
+
+
+def interrupted_fetch(manager, standin, monkeypatch, use_async):
+    """Leave a .part behind, as a run whose every attempt dropped would"""
+    monkeypatch.setattr(manager, "FTP_TRANSFER_RETRIES", 0)
+    standin.inject_fault("RETR", drop_after=20000)
+    assert not fetch(manager, standin, use_async)["success"]
+    monkeypatch.setattr(manager, "FTP_TRANSFER_RETRIES", 4)
+    part_path = os.path.join(manager.CACHE_DIR, LIB + ".part")
+    assert os.path.getsize(part_path) == 20000
+    return part_path
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_part_resumes_when_remote_file_is_unchanged(manager, standin, monkeypatch, use_async):
+    part_path = interrupted_fetch(manager, standin, monkeypatch, use_async)
+    rests = standin.stats.get("REST", 0)
+
+    result = fetch(manager, standin, use_async)
+
+    assert result["success"], result
+    assert standin.stats.get("REST", 0) == rests + 1
+    with open(result["path"], "rb") as f, open(remote_path(standin), "rb") as remote:
+        assert f.read() == remote.read()
+    assert not os.path.exists(part_path) and not os.path.exists(part_path + ".json")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_part_from_a_replaced_remote_file_is_discarded(manager, standin, monkeypatch, use_async):
+    interrupted_fetch(manager, standin, monkeypatch, use_async)
+    # Firmware update: same name, different library
+    replacement = b"\x7fELF" + random.Random(5).randbytes(50000)
+    with open(remote_path(standin), "wb") as f:
+        f.write(replacement)
+    rests = standin.stats.get("REST", 0)
+
+    result = fetch(manager, standin, use_async)
+
+    assert result["success"], result
+    assert standin.stats.get("REST", 0) == rests
+    with open(result["path"], "rb") as f:
+        assert f.read() == replacement
+
+
+def test_part_without_stamp_is_discarded(manager, standin):
+    os.makedirs(manager.CACHE_DIR, exist_ok=True)
+    part_path = os.path.join(manager.CACHE_DIR, LIB + ".part")
+    with open(part_path, "wb") as f:
+        f.write(b"left over by an older version")
+
+    result = fetch(manager, standin, use_async=False)
+
+    assert result["success"], result
+    assert standin.stats.get("REST", 0) == 0
+    with open(result["path"], "rb") as f, open(remote_path(standin), "rb") as remote:
+        assert f.read() == remote.read()
@@ -0,0 +1,56 @@
+import json
+import os
+import time
+
+
+def write_param_json(standin, title_id, title):
+    path = os.path.join(standin.root, "user", "app", title_id, "sce_sys", "param.json")
+    with open(path, "w") as f:
+        json.dump({"titleId": title_id, "title": title}, f)
+    os.utime(path, (time.time() + 60, time.time() + 60))
+
+
+def titles(result):
+    return {game["title_id"]: game["title"] for game in result["games"]}
+
+
+def test_updated_param_json_is_picked_up(manager, standin):
+    catalog = manager.InstalledGamesCatalog(interval=3600)
+    title_id = standin.title_ids[0]
+    assert titles(catalog.get(standin.host, standin.port))[title_id] == "Stand-in Game 0"
+
+    # A game update rewrites sce_sys only; the /user/app entry stays the same
+    write_param_json(standin, title_id, "Stand-in Game 0 (updated)")
+    retrs = standin.stats.get("RETR", 0)
+    catalog.refresh(standin.host, standin.port)
+
+    assert titles(catalog.get(standin.host, standin.port))[title_id] == "Stand-in Game 0 (updated)"
+    assert standin.stats.get("RETR", 0) > retrs
+
+
+def test_unchanged_titles_are_not_fetched_again(manager, standin):
+    catalog = manager.InstalledGamesCatalog(interval=3600)
+    catalog.get(standin.host, standin.port)
+    retrs = standin.stats.get("RETR", 0)
+
+    catalog.refresh(standin.host, standin.port)
+
+    assert standin.stats.get("RETR", 0) == retrs
+
+
+def test_refreshes_stop_for_a_console_nobody_asks_about(manager, standin):
+    catalog = manager.InstalledGamesCatalog(interval=0.05, idle_intervals=2)
+    catalog.get(standin.host, standin.port)
+    thread = catalog._state(standin.host, standin.port)["thread"]
+
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    lists = standin.stats.get("MLSD", 0)
+    time.sleep(0.2)
+    assert standin.stats.get("MLSD", 0) == lists
+
+    # Asking again refreshes right away and resumes the background refreshes
+    write_param_json(standin, standin.title_ids[0], "Renamed")
+    assert titles(catalog.get(standin.host, standin.port))[standin.title_ids[0]] == "Renamed"
+    assert catalog._state(standin.host, standin.port)["thread"].is_alive()
@@ -0,0 +1,58 @@
+LIBS = ["libSceAgc.sprx", "libSceNpAuth.sprx"]
+
+
+def finished_result(lib_name):
+    return {"success": True, "uploaded": True, "fakelib_path": "/data/games/PPSA10000/fakelib",
+            "message": f"Successfully processed and uploaded {lib_name}", "steps": []}
+
+
+def run_job(manager, monkeypatch, process):
+    jobs = manager.LibraryJobQueue()
+    monkeypatch.setattr(manager, "process_libraries_for_game",
+                        lambda ip, port, lib_names, firmware, game_path, progress=None:
+                        process(jobs, lib_names, progress))
+    job = jobs.submit("127.0.0.1", 2121, "/user/app/PPSA10000", LIBS, "6xx")
+    for _ in jobs.events(job["id"], timeout=5):
+        pass
+    return jobs.status(job["id"])
+
+
+def test_cancel_after_all_libraries_finished_succeeds(manager, monkeypatch):
+    def process(jobs, lib_names, progress):
+        results = [finished_result(lib_name) for lib_name in lib_names]
+        jobs.cancel(next(job["id"] for job in jobs.recent()))
+        return results
+
+    status = run_job(manager, monkeypatch, process)
+
+    assert status["status"] == "succeeded"
+    assert status["sync"] == {"uploaded": 2, "skipped": 0, "pruned": []}
+
+
+def test_cancelled_library_cancels_the_job(manager, monkeypatch):
+    def process(jobs, lib_names, progress):
+        return [finished_result(lib_names[0]),
+                {"success": False, "error": "Cancelled", "cancelled": True, "steps": []}]
+
+    status = run_job(manager, monkeypatch, process)
+
+    assert status["status"] == "cancelled"
+    assert [r["success"] for r in status["results"]] == [True, False]
+
+
+def test_summary_skips_prune_when_cancelled(manager, monkeypatch):
+    pruned = []
+    monkeypatch.setattr(manager, "prune_fakelib",
+                        lambda ip, port, path, keep: pruned.append(path) or {"success": True, "pruned": ["old.sprx"]})
+    done = [finished_result(lib_name) for lib_name in LIBS]
+
+    summary = manager.summarize_library_results("127.0.0.1", 2121, LIBS, done, prune=True)
+    assert summary["success"]
+    assert summary["sync"]["pruned"] == ["old.sprx"]
+
+    cancelled = done[:1] + [{"success": False, "error": "Cancelled", "cancelled": True, "steps": []}]
+    summary = manager.summarize_library_results("127.0.0.1", 2121, LIBS, cancelled, prune=True)
+    assert not summary["success"]
+    assert summary["results"][1]["message"] == "Cancelled"
+    assert summary["sync"] == {"uploaded": 1, "skipped": 0, "pruned": []}
+    assert len(pruned) == 1
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize("firmware, libraries", [
+    ("../..", None),
+    ("8xx", ["libSceAgc.sprx"]),
+    (None, ["../../etc/passwd"]),
+    ("6xx", ["libSceAgc.sprx", "libSceUnknown.sprx"]),
+    (None, "libSceAgc.sprx"),
+])
+def test_invalid_request_is_rejected_before_any_transfer(manager, standin, monkeypatch, firmware, libraries):
+    downloads = []
+    monkeypatch.setattr(manager, "download_patch_from_github", lambda *args: downloads.append(args))
+
+    assert manager.check_precheck_request(firmware, libraries)
+    result = manager.precheck_libraries(standin.host, standin.port, firmware, libraries)
+
+    assert not result["success"]
+    assert downloads == []
+    assert standin.stats.get("login", 0) == 0
+
+
+def test_valid_request_passes():
+    from src.backpork_manager import REQUIRED_LIBS, SUPPORTED_FIRMWARES, check_precheck_request
+    assert check_precheck_request(None, None) is None
+    assert check_precheck_request(SUPPORTED_FIRMWARES[0], list(REQUIRED_LIBS)) is None
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+from src.ftp_standin import FtpStandIn, KiB
+
+REMOTE = "/system/common/lib/libSceUpload.sprx"
+
+
+def payload(size=256 * 1024, seed=1):
+    return random.Random(seed).randbytes(size)
+
+
+def remote_bytes(standin):
+    with open(os.path.join(standin.root, REMOTE.lstrip("/")), "rb") as f:
+        return f.read()
+
+
+def write_remote(standin, data):
+    with open(os.path.join(standin.root, REMOTE.lstrip("/")), "wb") as f:
+        f.write(data)
+
+
+def upload(manager, standin, data, tmp_path, use_async):
+    if not use_async:
+        return manager.upload_patched_library(standin.host, standin.port, data, REMOTE)
+    local = tmp_path / "upload.sprx"
+    local.write_bytes(data)
+    return asyncio.run(manager.upload_patched_library_async(standin.host, standin.port, str(local), REMOTE))
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+@pytest.mark.parametrize("stale_size", [256 * 1024, 100 * 1024])
+def test_failed_stor_overwrites_stale_remote_file(manager, standin, tmp_path, use_async, stale_size):
+    # A previous build is on the console; the first STOR dies before any data is sent
+    write_remote(standin, payload(stale_size, seed=2))
+    standin.inject_fault("STOR", path=REMOTE, reply="421 Timeout.", close=True)
+    data = payload()
+
+    result = upload(manager, standin, data, tmp_path, use_async)
+
+    assert result["success"], result
+    assert remote_bytes(standin) == data
+    assert standin.stats.get("REST", 0) == 0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_dropped_stor_resumes_and_verifies(manager, standin, tmp_path, use_async):
+    standin.inject_fault("STOR", path=REMOTE, drop_after=96 * 1024)
+    data = payload()
+
+    result = upload(manager, standin, data, tmp_path, use_async)
+
+    assert result["success"], result
+    assert remote_bytes(standin) == data
+    # One REST for the STOR, one to read back only the re-sent range
+    assert standin.stats.get("REST", 0) == 2
+    assert standin.stats.get("RETR", 0) == 1
+    assert standin.stats.get("bytes_sent", 0) == len(data) - 96 * 1024
+
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_dropped_stor_appends_without_rest(manager, tmp_path, use_async):
+    with FtpStandIn(rest=False, layout={"games": 1, "lib_size": 64 * KiB, "cover_size": KiB}) as standin:
+        standin.inject_fault("STOR", path=REMOTE, drop_after=96 * 1024)
+        data = payload()
+
+        result = upload(manager, standin, data, tmp_path, use_async)
+
+        assert result["success"], result
+        assert remote_bytes(standin) == data
+        assert standin.stats.get("APPE", 0) == 1
+        assert standin.stats.get("RETR", 0) == 0